@@ -1,12 +1,14 @@
 import streamlit as st
 import paho.mqtt.client as mqtt
 import json
+import os
 import time
 from datetime import datetime
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from collections import deque
+from collections import deque, OrderedDict
+import sys
 import threading
 
 # Konfigurasi MQTT Broker (Wokwi menggunakan broker public)
@@ -25,6 +27,19 @@ TOPIC_SERVO_STATUS = "irrigation/actuator/status"
 # Inisialisasi data storage dengan deque untuk performa lebih baik
 MAX_DATA_POINTS = 50
 
+# Snapshot lokal untuk warm start setelah restart
+SNAPSHOT_FILE = "sensor_snapshot.json"
+SNAPSHOT_INTERVAL = 10  # detik antar checkpoint
+SNAPSHOT_SERIES = ("temp_air", "temp_soil", "water_level", "water_distance", "timestamps")
+
+# Render cache bersama untuk semua sesi viewer dalam satu proses
+RENDER_CACHE_MAX_ENTRIES = 64
+RENDER_CACHE_MAX_BYTES = 16 * 1024 * 1024  # 16 MB
+# Perkiraan ukuran layout figure 4 baris di luar data trace
+RENDER_FIGURE_BASE_BYTES = 32 * 1024
+# Dashboard belum melakukan downsampling, semua view memakai tier resolusi penuh
+RENDER_TIER_FULL = "full"
+
 
 class SensorData:
     def __init__(self):
@@ -37,29 +52,82 @@ class SensorData:
         self.last_update = None
         self.mqtt_connected = False
         self.connection_time = None
+        # True jika nilai terakhir berasal dari snapshot/retained (belum live)
+        self.warm = {
+            "temp_air": False,
+            "temp_soil": False,
+            "water_level": False,
+            "servo_status": False,
+        }
+        # Sensor yang sudah mengirim data live sejak proses berjalan
+        self.live = set()
+        self.last_checkpoint = time.time()
+        # Naik setiap ada data baru, dipakai sebagai key render cache
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def add_temp_air(self, value, warm=False):
+        with self.lock:
+            is_repeat = bool(self.temp_air) and self.temp_air[-1] == value
+            if not self._accept("temp_air", warm, is_repeat):
+                return
+            self.temp_air.append(value)
+            self._update_timestamp(warm)
+
+    def add_temp_soil(self, value, warm=False):
+        with self.lock:
+            is_repeat = bool(self.temp_soil) and self.temp_soil[-1] == value
+            if not self._accept("temp_soil", warm, is_repeat):
+                return
+            self.temp_soil.append(value)
+            self._update_timestamp(warm)
+
+    def add_water_level(self, capacity, distance=None, warm=False):
+        with self.lock:
+            is_repeat = (
+                bool(self.water_level)
+                and self.water_level[-1] == capacity
+                and (
+                    distance is None
+                    or (bool(self.water_distance) and self.water_distance[-1] == distance)
+                )
+            )
+            if not self._accept("water_level", warm, is_repeat):
+                return
+            self.water_level.append(capacity)
+            if distance is not None:
+                self.water_distance.append(distance)
+            self._update_timestamp(warm)
+
+    def set_servo_status(self, status, warm=False):
+        with self.lock:
+            is_repeat = status == self.servo_status
+            if not self._accept("servo_status", warm, is_repeat):
+                return
+            self.servo_status = status
+            self.version += 1
+
+    def _accept(self, key, warm, is_repeat=False):
+        """Tolak nilai retained jika sensor sudah live, atau jika sama dengan
+        titik tersimpan terakhir (retained yang sudah ada di snapshot)"""
+        if warm and (key in self.live or (self.warm[key] and is_repeat)):
+            return False
+        if not warm:
+            self.live.add(key)
+        self.warm[key] = warm
+        return True
 
-    def add_temp_air(self, value):
-        self.temp_air.append(value)
-        self._update_timestamp()
-
-    def add_temp_soil(self, value):
-        self.temp_soil.append(value)
-        self._update_timestamp()
-
-    def add_water_level(self, capacity, distance=None):
-        self.water_level.append(capacity)
-        if distance is not None:
-            self.water_distance.append(distance)
-        self._update_timestamp()
-
-    def _update_timestamp(self):
+    def _update_timestamp(self, warm=False):
         if len(self.timestamps) < MAX_DATA_POINTS or (
             len(self.timestamps) > 0
             and (datetime.now() - datetime.fromisoformat(self.timestamps[-1])).seconds
             >= 1
         ):
             self.timestamps.append(datetime.now().isoformat())
-        self.last_update = datetime.now()
+        self.version += 1
+        # Nilai retained bisa sudah lama, jangan dianggap update terbaru
+        if not warm:
+            self.last_update = datetime.now()
 
     def set_mqtt_connected(self, status):
         self.mqtt_connected = status
@@ -68,15 +136,362 @@ class SensorData:
         else:
             self.connection_time = None
 
+    def snapshot(self):
+        """Salinan immutable dari buffer, aman dibaca saat callback MQTT menulis"""
+        with self.lock:
+            return {
+                "version": self.version,
+                "temp_air": tuple(self.temp_air),
+                "temp_soil": tuple(self.temp_soil),
+                "water_level": tuple(self.water_level),
+                "water_distance": tuple(self.water_distance),
+                "timestamps": tuple(self.timestamps),
+                "servo_status": self.servo_status,
+                "warm": tuple(sorted(self.warm.items())),
+            }
+
+    def load_snapshot(self, path=SNAPSHOT_FILE):
+        """Isi buffer dari snapshot lokal, semua nilai ditandai warm"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Gagal membaca snapshot {path}: {e}")
+            return False
+
+        # Validasi seluruh isi dulu, buffer hanya diisi jika snapshot valid
+        try:
+            series = {}
+            for key in SNAPSHOT_SERIES:
+                values = saved.get(key, [])
+                if not isinstance(values, list):
+                    raise TypeError(f"'{key}' harus berupa list")
+                if key == "timestamps":
+                    for value in values:
+                        datetime.fromisoformat(value)
+                    series[key] = values
+                else:
+                    series[key] = [float(value) for value in values]
+            servo_status = saved.get("servo_status")
+            if servo_status is not None and not isinstance(servo_status, str):
+                raise TypeError("'servo_status' harus berupa string")
+            last_update = saved.get("last_update")
+            if last_update:
+                last_update = datetime.fromisoformat(last_update)
+        except (TypeError, ValueError, AttributeError) as e:
+            print(f"⚠️ Snapshot {path} tidak valid, mulai dengan buffer kosong: {e}")
+            return False
+
+        with self.lock:
+            for key, values in series.items():
+                getattr(self, key).extend(values)
+            for key in ("temp_air", "temp_soil", "water_level"):
+                self.warm[key] = bool(getattr(self, key))
+            if servo_status is not None:
+                self.servo_status = servo_status
+                self.warm["servo_status"] = True
+            if last_update:
+                self.last_update = last_update
+            self.version += 1
+        print(f"♻️ Warm start dari {path} ({len(self.timestamps)} data point)")
+        return True
+
+    def save_snapshot(self, path=SNAPSHOT_FILE):
+        """Tulis snapshot secara atomik (file sementara lalu os.replace)"""
+        snapshot = self.snapshot()
+        data = {key: list(snapshot[key]) for key in SNAPSHOT_SERIES}
+        data["servo_status"] = snapshot["servo_status"]
+        data["last_update"] = self.last_update.isoformat() if self.last_update else None
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Gagal menyimpan snapshot {path}: {e}")
+        self.last_checkpoint = time.time()
+
+    def maybe_checkpoint(self, path=SNAPSHOT_FILE):
+        if time.time() - self.last_checkpoint >= SNAPSHOT_INTERVAL:
+            self.save_snapshot(path)
+
+
+class RenderCache:
+    """LRU cache untuk figure dan nilai metric, dibagi antar sesi viewer"""
+
+    def __init__(
+        self, max_entries=RENDER_CACHE_MAX_ENTRIES, max_bytes=RENDER_CACHE_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, build):
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry
+
+        # Satu build per key: sesi lain yang meminta view sama menunggu hasilnya
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            with self._lock:
+                self.misses += 1
+            try:
+                entry = build()
+                self._store(key, entry)
+            finally:
+                # Hanya thread yang membangun entri yang melepas lock miliknya
+                with self._lock:
+                    if self._build_locks.get(key) is build_lock:
+                        del self._build_locks[key]
+            return entry
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def _store(self, key, entry):
+        size = _render_entry_size(entry)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes[key]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._total_bytes += size
+
+            # Buang entri paling lama tidak dipakai sampai batas terpenuhi
+            while (
+                len(self._entries) > self.max_entries
+                or self._total_bytes > self.max_bytes
+            ):
+                old_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _figure_size(fig):
+    """Perkiraan ukuran memori figure: layout + data x/y semua trace (byte)"""
+    size = RENDER_FIGURE_BASE_BYTES
+    for trace in fig.data:
+        for values in (trace.x, trace.y):
+            if values is not None:
+                size += sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+    return size
+
+
+def _render_entry_size(entry):
+    """Perkiraan ukuran memori entri render cache (byte)"""
+    size = _figure_size(entry["figure"]) if entry["figure"] is not None else 0
+    for metric in entry["metrics"].values():
+        size += sum(sys.getsizeof(v) for v in metric.values())
+    return size
+
+
+class MQTTConnection:
+    """Satu client MQTT per proses, dipakai bersama oleh semua sesi viewer"""
+
+    def __init__(self):
+        self.client = None
+        self.lock = threading.RLock()
+
+
+@st.cache_resource
+def get_sensor_data():
+    """Satu SensorData per proses, diisi oleh client MQTT bersama"""
+    sensor_data = SensorData()
+    # Warm start: tampilkan data terakhir sebelum restart tanpa menunggu sensor
+    sensor_data.load_snapshot()
+    return sensor_data
+
+
+@st.cache_resource
+def get_mqtt_connection():
+    """Satu MQTTConnection per proses, dipakai bersama oleh semua sesi"""
+    return MQTTConnection()
+
+
+@st.cache_resource
+def get_render_cache():
+    """Satu RenderCache per proses, dipakai bersama oleh semua sesi"""
+    return RenderCache()
+
+
+def render_cache_key(snapshot, tier=RENDER_TIER_FULL):
+    """Key cache: versi data, rentang waktu, dan tier downsampling"""
+    timestamps = snapshot["timestamps"]
+    time_range = (timestamps[0], timestamps[-1]) if timestamps else (None, None)
+    return (snapshot["version"], time_range, tier)
+
+
+def _metric_values(series, unit, warm=False):
+    current = series[-1] if series else 0
+    previous = series[-2] if len(series) > 1 else current
+    return {
+        "current": current,
+        "value": f"{current:.1f} {unit}",
+        "delta": f"{current - previous:.1f} {unit}",
+        "warm": warm,
+    }
+
+
+def _metric_label(label, metric):
+    """Tandai metric yang masih memakai nilai tersimpan (belum live)"""
+    return f"{label} ⏳" if metric["warm"] else label
+
+
+def build_sensor_figure(snapshot):
+    """Buat subplot 4 baris untuk semua sensor (termasuk distance)"""
+    fig = make_subplots(
+        rows=4,
+        cols=1,
+        subplot_titles=(
+            "Suhu Udara",
+            "Suhu Tanah",
+            "Level Air (%)",
+            "Jarak Air (cm)",
+        ),
+        vertical_spacing=0.08,
+        specs=[
+            [{"secondary_y": False}],
+            [{"secondary_y": False}],
+            [{"secondary_y": False}],
+            [{"secondary_y": False}],
+        ],
+    )
+
+    timestamps = list(snapshot["timestamps"])
+
+    # Suhu Udara
+    if snapshot["temp_air"]:
+        fig.add_trace(
+            go.Scatter(
+                x=timestamps[-len(snapshot["temp_air"]) :],
+                y=list(snapshot["temp_air"]),
+                name="Suhu Udara",
+                line=dict(color="#ff7f0e", width=2),
+                mode="lines+markers",
+            ),
+            row=1,
+            col=1,
+        )
+
+    # Suhu Tanah
+    if snapshot["temp_soil"]:
+        fig.add_trace(
+            go.Scatter(
+                x=timestamps[-len(snapshot["temp_soil"]) :],
+                y=list(snapshot["temp_soil"]),
+                name="Suhu Tanah",
+                line=dict(color="#2ca02c", width=2),
+                mode="lines+markers",
+            ),
+            row=2,
+            col=1,
+        )
+
+    # Level Air
+    if snapshot["water_level"]:
+        fig.add_trace(
+            go.Scatter(
+                x=timestamps[-len(snapshot["water_level"]) :],
+                y=list(snapshot["water_level"]),
+                name="Level Air",
+                line=dict(color="#1f77b4", width=2),
+                fill="tozeroy",
+                mode="lines+markers",
+            ),
+            row=3,
+            col=1,
+        )
+
+    # Distance Air
+    if snapshot["water_distance"]:
+        fig.add_trace(
+            go.Scatter(
+                x=timestamps[-len(snapshot["water_distance"]) :],
+                y=list(snapshot["water_distance"]),
+                name="Jarak Air",
+                line=dict(color="#d62728", width=2),
+                mode="lines+markers",
+            ),
+            row=4,
+            col=1,
+        )
+
+    # Update layout
+    fig.update_xaxes(title_text="Waktu", row=4, col=1)
+    fig.update_yaxes(title_text="°C", row=1, col=1)
+    fig.update_yaxes(title_text="°C", row=2, col=1)
+    fig.update_yaxes(title_text="%", row=3, col=1)
+    fig.update_yaxes(title_text="cm", row=4, col=1)
+
+    fig.update_layout(height=1000, showlegend=True, hovermode="x unified")
+    return fig
+
+
+def build_render_entry(snapshot):
+    """Figure + nilai metric yang siap ditampilkan"""
+    fig = build_sensor_figure(snapshot) if snapshot["timestamps"] else None
+
+    warm = dict(snapshot["warm"])
+    return {
+        "figure": fig,
+        "metrics": {
+            "temp_air": _metric_values(snapshot["temp_air"], "°C", warm["temp_air"]),
+            "temp_soil": _metric_values(snapshot["temp_soil"], "°C", warm["temp_soil"]),
+            "water_level": _metric_values(
+                snapshot["water_level"], "%", warm["water_level"]
+            ),
+            "water_distance": _metric_values(
+                snapshot["water_distance"], "cm", warm["water_level"]
+            ),
+            "servo_status": {
+                "value": snapshot["servo_status"],
+                "warm": warm["servo_status"],
+            },
+        },
+    }
+
 
-# Inisialisasi session state
-if "sensor_data" not in st.session_state:
-    st.session_state.sensor_data = SensorData()
-    st.session_state.mqtt_connected = False
-    st.session_state.client = None
+# Data sensor & client MQTT bersama untuk semua sesi dalam proses ini
+sensor_data = get_sensor_data()
+mqtt_conn = get_mqtt_connection()
 
 # Referensi global untuk callback MQTT (menghindari warning ScriptRunContext)
-_sensor_data_ref = st.session_state.sensor_data
+_sensor_data_ref = sensor_data
 
 
 # Callback MQTT
@@ -108,15 +523,17 @@ def on_message(client, userdata, msg):
     try:
         topic = msg.topic
         payload = json.loads(msg.payload.decode())
+        # Pesan retained = nilai terakhir dari broker, ditampilkan sebagai warm
+        warm = bool(msg.retain)
         
         # Debug logging
-        print(f"📨 [{topic}] {payload}")
+        print(f"📨 [{topic}]{' (retained)' if warm else ''} {payload}")
 
         # Gunakan referensi global untuk menghindari warning ScriptRunContext
         if topic == TOPIC_TEMP_AIR:
             # Support dua format: {"temperature": x} atau {"temp": x, "hum": x, "soil": x}
             temp = payload.get("temperature", payload.get("temp", 0))
-            _sensor_data_ref.add_temp_air(temp)
+            _sensor_data_ref.add_temp_air(temp, warm=warm)
             print(f"  🌤️ Air Temp: {temp}°C")
             
             # Jika ada data soil temperature di payload yang sama, ambil juga
@@ -127,22 +544,25 @@ def on_message(client, userdata, msg):
         elif topic == TOPIC_TEMP_SOIL:
             # Support tiga format: {"temperature": x} atau {"temp": x} atau {"soil": x}
             temp = payload.get("temperature", payload.get("temp", payload.get("soil", 0)))
-            _sensor_data_ref.add_temp_soil(temp)
+            _sensor_data_ref.add_temp_soil(temp, warm=warm)
             print(f"  🌱 Soil Temp: {temp}°C")
             
         elif topic == TOPIC_WATER_LEVEL:
             # Handle water level with capacity_percent and distance
             capacity = payload.get("capacity_percent", 0)
             distance = payload.get("distance", 0)
-            _sensor_data_ref.add_water_level(capacity, distance)
+            _sensor_data_ref.add_water_level(capacity, distance, warm=warm)
             print(f"  💧 Water: {capacity}% (distance: {distance}cm)")
             
         elif topic == TOPIC_SERVO_STATUS:
             # Support dua format: {"status": "OFF"} atau {"pump": "ON", "servo": 90, "mode": "MANUAL"}
             status = payload.get("status", payload.get("pump", "OFF"))
-            _sensor_data_ref.servo_status = status
+            _sensor_data_ref.set_servo_status(status, warm=warm)
             print(f"  🎛️ Servo: {status}")
 
+        # Checkpoint berkala untuk warm start berikutnya
+        _sensor_data_ref.maybe_checkpoint()
+
     except json.JSONDecodeError as e:
         print(f"❌ Failed to decode JSON from {msg.topic}: {e}")
     except Exception as e:
@@ -156,83 +576,85 @@ def on_disconnect(client, userdata, disconnect_flags, reason_code, properties=No
 
 
 # Fungsi untuk setup MQTT client
-def setup_mqtt():
-    try:
-        # Reset status koneksi sebelum mencoba koneksi baru
-        if hasattr(st.session_state, "sensor_data") and st.session_state.sensor_data:
-            st.session_state.sensor_data.set_mqtt_connected(False)
-        st.session_state.mqtt_connected = False
+def setup_mqtt(wait=True):
+    """Buat client MQTT baru; wait=False tidak memblokir first paint"""
+    # Satu client per proses: cegah dua sesi membuat client bersamaan
+    with mqtt_conn.lock:
+        try:
+            # Reset status koneksi sebelum mencoba koneksi baru
+            sensor_data.set_mqtt_connected(False)
+
+            # Tutup koneksi lama jika ada
+            if mqtt_conn.client is not None:
+                try:
+                    mqtt_conn.client.loop_stop()
+                    mqtt_conn.client.disconnect()
+                except:
+                    pass
+                mqtt_conn.client = None
+
+            # Buat client baru
+            client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+            client.on_connect = on_connect
+            client.on_message = on_message
+            client.on_disconnect = on_disconnect
+
+            # Set timeout yang lebih pendek untuk koneksi
+            if wait:
+                client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            else:
+                # Koneksi di thread network loop, render pertama tidak menunggu
+                client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
+            client.loop_start()
+            mqtt_conn.client = client
 
-        # Tutup koneksi lama jika ada
-        if st.session_state.client is not None:
-            try:
-                st.session_state.client.loop_stop()
-                st.session_state.client.disconnect()
-            except:
-                pass
-            st.session_state.client = None
-
-        # Buat client baru
-        client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
-        client.on_connect = on_connect
-        client.on_message = on_message
-        client.on_disconnect = on_disconnect
-
-        # Set timeout yang lebih pendek untuk koneksi
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        client.loop_start()
-        st.session_state.client = client
-
-        # Wait sebentar untuk koneksi
-        time.sleep(1)
-
-        # Cek apakah koneksi berhasil
-        connection_success = is_mqtt_connected()
-
-        if connection_success:
-            st.success(f"✅ Berhasil terhubung ke {MQTT_BROKER}")
-            return True
-        else:
-            st.warning("⏳ Sedang mencoba terhubung...")
-            return True  # Return true karena proses async
+            # Wait sebentar untuk koneksi
+            if wait:
+                time.sleep(1)
 
-    except Exception as e:
-        st.error(f"❌ Gagal menghubungkan ke MQTT Broker: {e}")
-        st.session_state.client = None
-        return False
+            # Cek apakah koneksi berhasil
+            connection_success = is_mqtt_connected()
+
+            if connection_success:
+                st.success(f"✅ Berhasil terhubung ke {MQTT_BROKER}")
+                return True
+            else:
+                st.warning("⏳ Sedang mencoba terhubung...")
+                return True  # Return true karena proses async
+
+        except Exception as e:
+            st.error(f"❌ Gagal menghubungkan ke MQTT Broker: {e}")
+            mqtt_conn.client = None
+            return False
 
 
 # Fungsi untuk cek status koneksi MQTT
 def is_mqtt_connected():
     """Check MQTT connection status from multiple sources"""
-    # Cek dari session state
-    session_connected = getattr(st.session_state, "mqtt_connected", False)
-
-    # Cek dari sensor_data juga
-    sensor_connected = False
-    if hasattr(st.session_state, "sensor_data") and st.session_state.sensor_data:
-        sensor_connected = st.session_state.sensor_data.mqtt_connected
+    # Cek dari sensor_data (di-update oleh callback MQTT)
+    sensor_connected = sensor_data.mqtt_connected
 
     # Cek apakah client aktif
+    client = mqtt_conn.client
     client_active = (
-        st.session_state.client is not None
-        and hasattr(st.session_state.client, "_sock")
-        and st.session_state.client._sock is not None
+        client is not None
+        and hasattr(client, "_sock")
+        and client._sock is not None
     )
 
     # Return true jika salah satu indikator menunjukkan terhubung
-    return session_connected or sensor_connected or client_active
+    return sensor_connected or client_active
 
 
 # Fungsi untuk kontrol servo
 def control_servo(action):
-    if st.session_state.client and is_mqtt_connected():
+    if mqtt_conn.client and is_mqtt_connected():
         # Format baru: {"pump": "ON/OFF", "servo": 90/0}
         servo_angle = 90 if action == "ON" else 0
         message = json.dumps({"pump": action, "servo": servo_angle})
 
         # Publish ke topic utama
-        st.session_state.client.publish(TOPIC_SERVO_CONTROL, message)
+        mqtt_conn.client.publish(TOPIC_SERVO_CONTROL, message)
         return True
     return False
 
@@ -288,23 +710,13 @@ with st.sidebar:
             '<p class="status-connected">🟢 Terhubung</p>', unsafe_allow_html=True
         )
         # Tampilkan waktu koneksi jika ada
-        if (
-            hasattr(st.session_state, "sensor_data")
-            and st.session_state.sensor_data
-            and st.session_state.sensor_data.connection_time
-        ):
-            conn_time = st.session_state.sensor_data.connection_time.strftime(
-                "%H:%M:%S"
-            )
+        if sensor_data.connection_time:
+            conn_time = sensor_data.connection_time.strftime("%H:%M:%S")
             st.caption(f"Terhubung sejak: {conn_time}")
 
         # Tampilkan info data terakhir
-        if (
-            hasattr(st.session_state, "sensor_data")
-            and st.session_state.sensor_data
-            and st.session_state.sensor_data.last_update
-        ):
-            last_data = st.session_state.sensor_data.last_update.strftime("%H:%M:%S")
+        if sensor_data.last_update:
+            last_data = sensor_data.last_update.strftime("%H:%M:%S")
             st.caption(f"Data terakhir: {last_data}")
     else:
         st.markdown(
@@ -330,6 +742,15 @@ with st.sidebar:
     st.text(f"Broker: {MQTT_BROKER}")
     st.text(f"Port: {MQTT_PORT}")
 
+    # Statistik render cache bersama
+    st.subheader("🗄️ Render Cache")
+    cache_stats = get_render_cache().stats()
+    st.text(f"Hit: {cache_stats['hits']} | Miss: {cache_stats['misses']}")
+    st.caption(
+        f"Hit rate {cache_stats['hit_rate']:.0%} · {cache_stats['entries']} entri · "
+        f"{cache_stats['bytes'] / 1024:.1f} KB"
+    )
+
     st.divider()
 
     # Kontrol Servo
@@ -347,8 +768,7 @@ with st.sidebar:
             if control_servo("ON"):
                 st.success("Pump ON!")
                 # Force update servo status
-                if hasattr(st.session_state, "sensor_data"):
-                    st.session_state.sensor_data.servo_status = "ON"
+                sensor_data.set_servo_status("ON")
             else:
                 st.error("Gagal mengirim perintah")
 
@@ -357,15 +777,15 @@ with st.sidebar:
             if control_servo("OFF"):
                 st.success("Pump OFF!")
                 # Force update servo status
-                if hasattr(st.session_state, "sensor_data"):
-                    st.session_state.sensor_data.servo_status = "OFF"
+                sensor_data.set_servo_status("OFF")
             else:
                 st.error("Gagal mengirim perintah")
 
     # Status servo dengan indikator visual
-    servo_status = st.session_state.sensor_data.servo_status
+    servo_status = sensor_data.servo_status
     status_color = "🟢" if servo_status == "ON" else "🔴"
-    st.markdown(f"**Status: {status_color} {servo_status}**")
+    servo_warm = " ⏳" if sensor_data.warm["servo_status"] else ""
+    st.markdown(f"**Status: {status_color} {servo_status}{servo_warm}**")
 
     st.divider()
 
@@ -377,37 +797,48 @@ with st.sidebar:
     else:
         refresh_rate_value = 5
 
-# Setup MQTT saat pertama kali (hanya jika belum ada)
-if st.session_state.client is None:
-    setup_mqtt()
+# Setup MQTT saat pertama kali (hanya jika belum ada di proses ini)
+with mqtt_conn.lock:
+    if mqtt_conn.client is None:
+        setup_mqtt(wait=False)
 
 # Main content area
 tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "📈 Grafik Real-time", "ℹ️ Info"])
 
+# Ambil figure & metric dari render cache bersama (satu build untuk view yang sama)
+sensor_snapshot = sensor_data.snapshot()
+render_entry = get_render_cache().get_or_build(
+    render_cache_key(sensor_snapshot),
+    lambda: build_render_entry(sensor_snapshot),
+)
+metrics = render_entry["metrics"]
+has_warm_data = any(metric["warm"] for metric in metrics.values())
+
 with tab1:
     # Metrics Row - Wokwi 1 (Sensor Suhu)
+    if has_warm_data:
+        st.caption("⏳ = nilai tersimpan (snapshot/retained), menunggu data live dari sensor")
+
     st.subheader("🌡️ Wokwi 1 - Sensor Suhu")
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        temp_air_current = st.session_state.sensor_data.temp_air[-1] if st.session_state.sensor_data.temp_air else 0
         st.metric(
-            label="🌤️ Suhu Udara",
-            value=f"{temp_air_current:.1f} °C",
-            delta=f"{temp_air_current - (st.session_state.sensor_data.temp_air[-2] if len(st.session_state.sensor_data.temp_air) > 1 else temp_air_current):.1f} °C"
+            label=_metric_label("🌤️ Suhu Udara", metrics["temp_air"]),
+            value=metrics["temp_air"]["value"],
+            delta=metrics["temp_air"]["delta"]
         )
     
     with col2:
-        temp_soil_current = st.session_state.sensor_data.temp_soil[-1] if st.session_state.sensor_data.temp_soil else 0
         st.metric(
-            label="🌱 Suhu Tanah",
-            value=f"{temp_soil_current:.1f} °C",
-            delta=f"{temp_soil_current - (st.session_state.sensor_data.temp_soil[-2] if len(st.session_state.sensor_data.temp_soil) > 1 else temp_soil_current):.1f} °C"
+            label=_metric_label("🌱 Suhu Tanah", metrics["temp_soil"]),
+            value=metrics["temp_soil"]["value"],
+            delta=metrics["temp_soil"]["delta"]
         )
     
     with col3:
-        if st.session_state.sensor_data.last_update:
-            time_diff = (datetime.now() - st.session_state.sensor_data.last_update).seconds
+        if sensor_data.last_update:
+            time_diff = int((datetime.now() - sensor_data.last_update).total_seconds())
             st.metric(
                 label="⏱️ Update Terakhir",
                 value=f"{time_diff} detik yang lalu"
@@ -422,33 +853,25 @@ with tab1:
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        water_level_current = (
-            st.session_state.sensor_data.water_level[-1]
-            if st.session_state.sensor_data.water_level
-            else 0
-        )
+        water_level_current = metrics["water_level"]["current"]
         st.metric(
-            label="💦 Level Air",
-            value=f"{water_level_current:.1f} %",
-            delta=f"{water_level_current - (st.session_state.sensor_data.water_level[-2] if len(st.session_state.sensor_data.water_level) > 1 else water_level_current):.1f} %",
+            label=_metric_label("💦 Level Air", metrics["water_level"]),
+            value=metrics["water_level"]["value"],
+            delta=metrics["water_level"]["delta"],
         )
 
     with col2:
         # Show distance info
-        water_distance_current = (
-            st.session_state.sensor_data.water_distance[-1]
-            if st.session_state.sensor_data.water_distance
-            else 0
-        )
         st.metric(
-            label="📏 Jarak Air",
-            value=f"{water_distance_current:.1f} cm",
-            delta=f"{water_distance_current - (st.session_state.sensor_data.water_distance[-2] if len(st.session_state.sensor_data.water_distance) > 1 else water_distance_current):.1f} cm",
+            label=_metric_label("📏 Jarak Air", metrics["water_distance"]),
+            value=metrics["water_distance"]["value"],
+            delta=metrics["water_distance"]["delta"],
         )
 
     with col3:
         st.metric(
-            label="🎛️ Status Servo", value=st.session_state.sensor_data.servo_status
+            label=_metric_label("🎛️ Status Servo", metrics["servo_status"]),
+            value=metrics["servo_status"]["value"],
         )
 
         # Progress bar untuk water level
@@ -458,95 +881,10 @@ with tab1:
 with tab2:
     st.subheader("📈 Grafik Sensor Real-time")
 
-    if len(st.session_state.sensor_data.timestamps) > 0:
-        # Buat subplot untuk semua sensor (termasuk distance)
-        fig = make_subplots(
-            rows=4,
-            cols=1,
-            subplot_titles=(
-                "Suhu Udara",
-                "Suhu Tanah",
-                "Level Air (%)",
-                "Jarak Air (cm)",
-            ),
-            vertical_spacing=0.08,
-            specs=[
-                [{"secondary_y": False}],
-                [{"secondary_y": False}],
-                [{"secondary_y": False}],
-                [{"secondary_y": False}],
-            ],
-        )
-
-        timestamps = list(st.session_state.sensor_data.timestamps)
-
-        # Suhu Udara
-        if st.session_state.sensor_data.temp_air:
-            fig.add_trace(
-                go.Scatter(
-                    x=timestamps[-len(st.session_state.sensor_data.temp_air) :],
-                    y=list(st.session_state.sensor_data.temp_air),
-                    name="Suhu Udara",
-                    line=dict(color="#ff7f0e", width=2),
-                    mode="lines+markers",
-                ),
-                row=1,
-                col=1,
-            )
-
-        # Suhu Tanah
-        if st.session_state.sensor_data.temp_soil:
-            fig.add_trace(
-                go.Scatter(
-                    x=timestamps[-len(st.session_state.sensor_data.temp_soil) :],
-                    y=list(st.session_state.sensor_data.temp_soil),
-                    name="Suhu Tanah",
-                    line=dict(color="#2ca02c", width=2),
-                    mode="lines+markers",
-                ),
-                row=2,
-                col=1,
-            )
-
-        # Level Air
-        if st.session_state.sensor_data.water_level:
-            fig.add_trace(
-                go.Scatter(
-                    x=timestamps[-len(st.session_state.sensor_data.water_level) :],
-                    y=list(st.session_state.sensor_data.water_level),
-                    name="Level Air",
-                    line=dict(color="#1f77b4", width=2),
-                    fill="tozeroy",
-                    mode="lines+markers",
-                ),
-                row=3,
-                col=1,
-            )
-
-        # Distance Air
-        if st.session_state.sensor_data.water_distance:
-            fig.add_trace(
-                go.Scatter(
-                    x=timestamps[-len(st.session_state.sensor_data.water_distance) :],
-                    y=list(st.session_state.sensor_data.water_distance),
-                    name="Jarak Air",
-                    line=dict(color="#d62728", width=2),
-                    mode="lines+markers",
-                ),
-                row=4,
-                col=1,
-            )
-
-        # Update layout
-        fig.update_xaxes(title_text="Waktu", row=4, col=1)
-        fig.update_yaxes(title_text="°C", row=1, col=1)
-        fig.update_yaxes(title_text="°C", row=2, col=1)
-        fig.update_yaxes(title_text="%", row=3, col=1)
-        fig.update_yaxes(title_text="cm", row=4, col=1)
-
-        fig.update_layout(height=1000, showlegend=True, hovermode="x unified")
-
-        st.plotly_chart(fig, use_container_width=True)
+    if render_entry["figure"] is not None:
+        if has_warm_data:
+            st.caption("⏳ Grafik memuat data tersimpan (snapshot/retained)")
+        st.plotly_chart(render_entry["figure"], use_container_width=True)
     else:
         st.info("📡 Menunggu data dari sensor...")
 
@@ -643,6 +981,8 @@ with tab3:
     ### 💡 Tips & Catatan:
     
     - Dashboard menyimpan hingga 50 data point terakhir
+    - Setelah restart, data terakhir dimuat dari snapshot lokal (ditandai ⏳ sampai data live masuk)
+    - Grafik & metric di-cache bersama untuk semua sesi (lihat statistik Render Cache di sidebar)
     - Auto refresh dapat menyebabkan flicker, gunakan seperlunya
     - Data MQTT masuk real-time meskipun auto-refresh off
     - Lihat terminal untuk debug log setiap data yang masuk
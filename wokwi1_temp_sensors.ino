@@ -111,7 +111,8 @@ void publishSensorData() {
     char buffer[200];
     serializeJson(doc, buffer);
 
-    if (client.publish(TOPIC_TEMP_AIR, buffer)) {
+    // retained: dashboard langsung menerima nilai terakhir saat subscribe
+    if (client.publish(TOPIC_TEMP_AIR, buffer, true)) {
       Serial.print("Published Air: ");
       Serial.println(buffer);
     } else {
@@ -129,7 +130,7 @@ void publishSensorData() {
     char bufferSoil[100];
     serializeJson(docSoil, bufferSoil);
 
-    if (client.publish(TOPIC_TEMP_SOIL, bufferSoil)) {
+    if (client.publish(TOPIC_TEMP_SOIL, bufferSoil, true)) {
       Serial.print("Published Soil: ");
       Serial.println(bufferSoil);
     } else {
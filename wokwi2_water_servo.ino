@@ -124,7 +124,8 @@ void publishPumpStatus()
   String jsonString;
   serializeJson(doc, jsonString);
 
-  client.publish(topic_pump_status, jsonString.c_str());
+  // retained: dashboard langsung menerima status terakhir saat subscribe
+  client.publish(topic_pump_status, jsonString.c_str(), true);
   Serial.println("Published pump status: " + jsonString);
 }
 
@@ -314,7 +315,7 @@ void publishSensorData()
   String jsonString;
   serializeJson(doc, jsonString);
 
-  bool published = client.publish(topic_sensor_data, jsonString.c_str());
+  bool published = client.publish(topic_sensor_data, jsonString.c_str(), true);
 
   if (published)
   {